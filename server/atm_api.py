@@ -1,9 +1,8 @@
 # atm_api.py
 from flask import Flask, request, jsonify, send_file
-from atm_core import ATM
+from atm_core import ATM, SEARCH_LIMIT
 from flask_cors import CORS
-import json, os
-from hashlib import sha256
+import os
 import csv
 from io import StringIO
 import datetime
@@ -13,41 +12,18 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
 otp_storage = {}
+MAX_SEARCH_LIMIT = 50
 
 app = Flask(__name__)
 CORS(app)
-atm = ATM("users.json")  # same backend data file
+# Set ATM_ACCOUNTS_DIR to store one file per account instead of users.json
+atm = ATM("users.json", accounts_dir=os.environ.get("ATM_ACCOUNTS_DIR"))
 
 # 🏠 Health check
 @app.route("/", methods=["GET"])
 def home():
     return jsonify({"message": "ATM Flask API is running"}), 200
 
-# JSON file path
-USER_FILE = os.path.join(os.path.dirname(__file__), "users.json")
-
-with open(USER_FILE, 'r') as f:
-    users = json.load(f)
-
-def load_users():
-    """Loads all user data from JSON file."""
-    if os.path.exists(USER_FILE):
-        try:
-            with open(USER_FILE, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return {}
-    return {}
-
-def save_users(users):
-    """Saves all user data safely to JSON file."""
-    try:
-        with open(USER_FILE, "w") as f:
-            json.dump(users, f, indent=4)
-        print("[INFO] Users saved successfully!")
-    except Exception as e:
-        print(f"[ERROR] Could not save users: {e}")
-
 #otp generation
 @app.route('/send_otp', methods=['POST'])
 def send_otp():
@@ -89,48 +65,22 @@ def verify_otp():
     username = data['username']
     password = data['password']
 
-    USER_FILE = os.path.join(os.path.dirname(__file__), 'users.json')
-
-    # Load existing users safely
-    if not os.path.exists(USER_FILE) or os.stat(USER_FILE).st_size == 0:
-        users = {}
-    else:
-        with open(USER_FILE, 'r', encoding='utf-8') as f:
-            users = json.load(f)
-
     # OTP check
     if email not in otp_storage or otp_storage[email] != entered_otp:
         return jsonify({"error": "Invalid OTP"}), 400
 
-    # ✅ Use the same SHA256 hashing as the rest of the program
-    password_hash = sha256(password.encode()).hexdigest()
-
-    users[username] = {
-        "email": email,
-        "password_hash": password_hash,
-        "pin_hash": sha256("0000".encode()).hexdigest(),  # default PIN if not provided
-        "balance": 0.0,
-        "transactions": [],
-        "rating": None,
-        "logged_in": False
-    }
-
-    # ✅ Safely write the updated users.json
+    # ✅ Create through the ATM so only the new account is written
     try:
-        with open(USER_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users, f, indent=4)
-        print(f"[INFO] User '{username}' saved successfully to {USER_FILE}")
-    except Exception as e:
+        success, message = atm.create_account(username, password, "0000", email=email)  # default PIN
+    except RuntimeError as e:
         print(f"[ERROR] Could not save user data: {e}")
         return jsonify({"error": f"File write error: {str(e)}"}), 500
+    if not success:
+        return jsonify({"error": message}), 400
 
     # Clean up OTP
     otp_storage.pop(email, None)
 
-    # ✅ Refresh in-memory ATM state so new user becomes visible for login
-    atm.users = users
-    atm._save()
-
     print(f"[INFO] New verified user added: {username} ({email})")
 
     return jsonify({"message": "Email verified & signup successful!"}), 200
@@ -151,30 +101,14 @@ def create_account():
     if not username or not password or not pin:
         return jsonify({"success": False, "message": "All fields required"}), 400
 
-    # Load existing users
-    users = load_users()
-
-    # Check if username already exists
-    if username in users:
-        return jsonify({"success": False, "message": "Username already exists"}), 400
-
-    # Hash password and PIN
-    password_hash = sha256(password.encode()).hexdigest()
-    pin_hash = sha256(pin.encode()).hexdigest()
-
-    # Create new user with full schema (matching Apple etc.)
-    users[username] = {
-        "password_hash": password_hash,
-        "pin_hash": pin_hash,
-        "balance": 0.0,
-        "transactions": [],
-        "rating": None,
-        "logged_in": False
-    }
-
-    # Save back to JSON
-    save_users(users)
-    atm.users = users  # update in-memory object
+    # Create through the ATM so the in-memory state and store stay in sync
+    try:
+        success, message = atm.create_account(username, password, pin)
+    except RuntimeError as e:
+        print(f"[ERROR] Could not save user data: {e}")
+        return jsonify({"success": False, "message": f"File write error: {str(e)}"}), 500
+    if not success:
+        return jsonify({"success": False, "message": message}), 400
 
     return jsonify({"success": True, "message": "Account created successfully!"}), 200
 
@@ -186,14 +120,6 @@ def login():
     username = data.get("username")
     password = data.get("password")
 
-    # 🔁 Always reload the latest users.json before attempting login
-    try:
-        with open(atm.data_file, "r", encoding="utf-8") as f:
-            atm.users = json.load(f)
-    except Exception as e:
-        print(f"[ERROR] Could not reload users.json: {e}")
-        return jsonify({"error": "Server data issue"}), 500
-
     success, message = atm.login(username, password)
     if success:
         return jsonify({"message": message}), 200
@@ -261,6 +187,27 @@ def transfer():
     }), (200 if success else 400)
 
 
+# 🔎 Recipient search
+@app.route("/users/search", methods=["GET"])
+def search_users():
+    if not atm.current_user:
+        return jsonify({"success": False, "message": "No user logged in"}), 401
+
+    prefix = request.args.get("prefix", "")
+    try:
+        limit = int(request.args.get("limit", SEARCH_LIMIT))
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        return jsonify({"success": False, "message": "Invalid limit"}), 400
+    limit = min(limit, MAX_SEARCH_LIMIT)
+
+    return jsonify({
+        "success": True,
+        "users": atm.search_users(prefix, limit)
+    }), 200
+
+
 # 📊 Balance check
 @app.route("/balance", methods=["GET"])
 def balance():
@@ -330,6 +277,7 @@ def rate_project():
     # ✅ Save rating if user still logged in
     if atm.current_user and atm.current_user in atm.users:
         atm.users[atm.current_user]["rating"] = rating
+        atm._mark_dirty(atm.current_user)
         atm._save()
         print(f"[INFO] {atm.current_user} rated the project {rating}⭐")
     else:
@@ -2,10 +2,15 @@
 import json
 import os
 import hashlib
+import shutil
+import tempfile
+from bisect import bisect_left, insort
 from datetime import datetime
 
 DATA_FILE = "users.json"
 MAX_DEPOSIT = 50000.0
+SEARCH_LIMIT = 10
+ACCOUNT_SUFFIX = ".account.json"  # tells account files apart from other JSON
 
 
 def sha256(text: str) -> str:
@@ -13,14 +18,171 @@ def sha256(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
 
+def _write_temp_json(path: str, data) -> str:
+    """Write JSON to a temp file beside `path` and return the temp file's path."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def _atomic_write_json(path: str, data):
+    """Write JSON to a temp file beside `path`, then rename it into place."""
+    os.replace(_write_temp_json(path, data), path)
+
+
+def normalize_username(username: str) -> str:
+    """Case-fold a username and collapse its internal whitespace."""
+    return " ".join(str(username).split()).casefold()
+
+
+class UserIndex:
+    """In-memory lookup of usernames by normalized name and by prefix."""
+
+    def __init__(self, usernames=()):
+        self.rebuild(usernames)
+
+    def rebuild(self, usernames):
+        """Replace the index contents with the given usernames."""
+        self._by_name = {}
+        entries = []
+        for username in usernames:
+            key = normalize_username(username)
+            self._by_name.setdefault(key, []).append(username)
+            entries.append((key, username))
+        entries.sort()
+        self._sorted = entries  # (normalized, username), ordered for bisect
+
+    def add(self, username: str):
+        """Index a newly created account."""
+        key = normalize_username(username)
+        self._by_name.setdefault(key, []).append(username)
+        insort(self._sorted, (key, username))
+
+    def lookup(self, username: str):
+        """Return every stored username matching `username` after normalization."""
+        return list(self._by_name.get(normalize_username(username), ()))
+
+    def search(self, prefix: str, limit: int = SEARCH_LIMIT):
+        """Return up to `limit` usernames whose normalized form starts with `prefix`."""
+        key = normalize_username(prefix)
+        if not key or limit <= 0:
+            return []
+        matches = []
+        i = bisect_left(self._sorted, (key, ""))
+        while i < len(self._sorted) and len(matches) < limit:
+            name_key, username = self._sorted[i]
+            if not name_key.startswith(key):
+                break
+            matches.append(username)
+            i += 1
+        return matches
+
+    def __len__(self):
+        return len(self._sorted)
+
+
 class ATM:
-    def __init__(self, data_file=DATA_FILE):
+    def __init__(self, data_file=DATA_FILE, accounts_dir=None):
+        """
+        By default every account lives in the single `data_file`. When
+        `accounts_dir` is given, each account is stored in its own file
+        there and only changed accounts are rewritten on save. A missing
+        or empty `accounts_dir` is seeded from `data_file` if that exists.
+        """
         self.data_file = data_file
-        self.users = self._load()
+        self.accounts_dir = accounts_dir
         self.current_user = None  # active username
 
+        data_dir = os.path.abspath(os.path.dirname(data_file) or ".")
+        if accounts_dir and os.path.abspath(accounts_dir) == data_dir:
+            raise RuntimeError("accounts_dir must not be the folder holding the data file.")
+
+        if accounts_dir and not self._has_account_files():
+            # Migrate the legacy single-file store on first use
+            self.users = self._load_file()
+            self._migrate_to_accounts_dir()
+        else:
+            self.users = self._load()
+            self._dirty.clear()
+
+    @property
+    def users(self):
+        return self._users
+
+    @users.setter
+    def users(self, users):
+        """Replace all accounts, marking them dirty, and rebuild the username index."""
+        self._users = users
+        self._dirty = set(users)
+        self.index = UserIndex(users)
+
     # ---------- Persistence ----------
+    def _account_path(self, username: str, directory=None) -> str:
+        # Hashed so names with spaces, slashes or differing case map to distinct files
+        return os.path.join(directory or self.accounts_dir, sha256(username) + ACCOUNT_SUFFIX)
+
+    def _account_record(self, username: str):
+        return {"username": username, "account": self.users[username]}
+
+    def _has_account_files(self) -> bool:
+        if not os.path.isdir(self.accounts_dir):
+            return False
+        return any(name.endswith(ACCOUNT_SUFFIX) for name in os.listdir(self.accounts_dir))
+
+    def _migrate_to_accounts_dir(self):
+        """Write every account into a staging directory, then rename it into place."""
+        if os.path.isdir(self.accounts_dir) and os.listdir(self.accounts_dir):
+            raise RuntimeError(
+                f"{self.accounts_dir} is not empty and holds no account files; refusing to migrate into it."
+            )
+        parent = os.path.dirname(os.path.abspath(self.accounts_dir))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=parent, suffix=".tmp")
+        try:
+            for username in self.users:
+                _atomic_write_json(self._account_path(username, staging), self._account_record(username))
+            if os.path.isdir(self.accounts_dir):
+                os.rmdir(self.accounts_dir)  # empty, checked above
+            os.replace(staging, self.accounts_dir)
+        except OSError as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise RuntimeError(f"Failed to migrate data file: {e}")
+        self._dirty.clear()
+
+    def _mark_dirty(self, username: str):
+        """Flag an account as changed so the next _save() writes it."""
+        self._dirty.add(username)
+
     def _load(self):
+        """Load every account from the configured store."""
+        if self.accounts_dir:
+            return self._load_accounts_dir()
+        return self._load_file()
+
+    def _load_accounts_dir(self):
+        """Read one record per file, skipping any that are corrupted."""
+        users = {}
+        for name in sorted(os.listdir(self.accounts_dir)):
+            if not name.endswith(ACCOUNT_SUFFIX):
+                continue
+            path = os.path.join(self.accounts_dir, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+                users[record["username"]] = record["account"]
+            except (json.JSONDecodeError, IOError, KeyError, TypeError):
+                print(f"⚠️ {name} corrupted or unreadable — skipping.")
+        return users
+
+    def _load_file(self):
         """Load users.json safely, handle corruption gracefully."""
         if not os.path.exists(self.data_file):
             return {}
@@ -32,20 +194,38 @@ class ATM:
             return {}
 
     def _save(self):
-        """Write all user data back to users.json safely."""
+        """Flush dirty accounts: only their files, or the whole users.json."""
+        if not self._dirty:
+            return
         try:
-            with open(self.data_file, "w", encoding="utf-8") as f:
-                json.dump(self.users, f, indent=4)
-        except IOError as e:
+            if self.accounts_dir:
+                os.makedirs(self.accounts_dir, exist_ok=True)
+                # Stage every file before renaming any, so an I/O error persists nothing
+                staged = []
+                try:
+                    for username in self._dirty:
+                        path = self._account_path(username)
+                        staged.append((_write_temp_json(path, self._account_record(username)), path))
+                except OSError:
+                    for tmp_path, _ in staged:
+                        os.remove(tmp_path)
+                    raise
+                for tmp_path, path in staged:
+                    os.replace(tmp_path, path)
+                self._dirty.clear()
+            else:
+                _atomic_write_json(self.data_file, self.users)
+                self._dirty.clear()
+        except OSError as e:
             raise RuntimeError(f"Failed to write data file: {e}")
 
     # ---------- Account management ----------
-    def create_account(self, username: str, password: str, pin: str):
+    def create_account(self, username: str, password: str, pin: str, email=None):
         """Create new account with password & pin hashes."""
         username = username.strip()
         if not username or not password or not pin:
             return False, "All fields are required."
-        if username in self.users:
+        if username in self.users or self.index.lookup(username):
             return False, "Username already exists."
 
         self.users[username] = {
@@ -56,6 +236,10 @@ class ATM:
             "rating": None,
             "logged_in": False,
         }
+        if email:
+            self.users[username]["email"] = email
+        self.index.add(username)
+        self._mark_dirty(username)
         self._save()
         return True, f"Account '{username}' created."
 
@@ -71,11 +255,14 @@ class ATM:
             return False, "Incorrect password."
 
         # Logout everyone else
-        for u in self.users.values():
-            u["logged_in"] = False
+        for name, u in self.users.items():
+            if u.get("logged_in"):
+                u["logged_in"] = False
+                self._mark_dirty(name)
 
         user["logged_in"] = True
         self.current_user = username
+        self._mark_dirty(username)
         self._save()
 
         return True, f"Welcome back, {username}!"
@@ -85,16 +272,19 @@ class ATM:
         """Safely log out current user."""
         if self.current_user:
             self.users[self.current_user]["logged_in"] = False
+            self._mark_dirty(self.current_user)
             self._save()
         self.current_user = None
 
     # ---------- Utilities ----------
-    def _add_transaction(self, username, ttype, amount):
+    def _add_transaction(self, username, ttype, amount, save=True):
         """Record transaction with timestamp."""
         ts = datetime.now().isoformat(sep=" ", timespec="seconds")
         entry = {"type": ttype, "amount": amount, "timestamp": ts}
         self.users[username]["transactions"].append(entry)
-        self._save()
+        self._mark_dirty(username)
+        if save:
+            self._save()
 
     def get_balance(self, username=None):
         username = username or self.current_user
@@ -108,6 +298,20 @@ class ATM:
             return []
         return list(self.users[username]["transactions"])
 
+    def resolve_username(self, username: str):
+        """
+        Return every account `username` may refer to: the exact name if it
+        exists, otherwise all case/whitespace-insensitive matches.
+        """
+        username = (username or "").strip()
+        if username in self.users:
+            return [username]
+        return self.index.lookup(username)
+
+    def search_users(self, prefix: str, limit: int = SEARCH_LIMIT):
+        """Return up to `limit` usernames starting with `prefix` (case-insensitive)."""
+        return self.index.search(prefix, limit)
+
     # ---------- Money operations ----------
     def deposit(self, amount: float):
         if self.current_user is None:
@@ -146,9 +350,12 @@ class ATM:
     def transfer(self, to_username: str, amount: float, pin: str):
         if self.current_user is None:
             return False, "Login required."
-        to_username = to_username.strip()
-        if to_username not in self.users:
+        matches = self.resolve_username(to_username)
+        if len(matches) > 1:
+            return False, "Recipient is ambiguous; enter the exact username."
+        if not matches:
             return False, "Recipient not found."
+        to_username = matches[0]
         if to_username == self.current_user:
             return False, "Cannot transfer to yourself."
 
@@ -163,11 +370,20 @@ class ATM:
         if amount > self.users[self.current_user]["balance"]:
             return False, "Insufficient funds."
 
-        # Transfer between users
+        # Transfer between users; both sides are staged before a single save
         self.users[self.current_user]["balance"] -= amount
         self.users[to_username]["balance"] += amount
-        self._add_transaction(self.current_user, f"Transfer to {to_username}", -amount)
-        self._add_transaction(to_username, f"Transfer from {self.current_user}", amount)
+        self._add_transaction(self.current_user, f"Transfer to {to_username}", -amount, save=False)
+        self._add_transaction(to_username, f"Transfer from {self.current_user}", amount, save=False)
+        try:
+            self._save()
+        except RuntimeError as e:
+            # Nothing was written, so undo the in-memory change to match disk
+            for name, delta in ((self.current_user, amount), (to_username, -amount)):
+                self.users[name]["balance"] += delta
+                self.users[name]["transactions"].pop()
+                self._dirty.discard(name)
+            return False, f"Transfer failed: {e}"
         return True, f"Transferred ₹{amount:.2f} to {to_username}. New balance: ₹{self.get_balance():.2f}"
 
     # ---------- PIN & Password ----------
@@ -180,6 +396,7 @@ class ATM:
             return False, "Incorrect old PIN."
 
         user_data["pin_hash"] = sha256(str(new_pin))
+        self._mark_dirty(self.current_user)
         self._save()
         return True, "PIN changed successfully."
 
@@ -192,6 +409,7 @@ class ATM:
             return False, "New password required."
 
         self.users[self.current_user]["password_hash"] = sha256(new_password)
+        self._mark_dirty(self.current_user)
         self._save()
         return True, "Password changed successfully."
 
@@ -206,6 +424,7 @@ class ATM:
         if rating < 1 or rating > 5:
             return False, "Rating must be 1–5."
         self.users[self.current_user]["rating"] = rating
+        self._mark_dirty(self.current_user)
         self._save()
         return True, f"Thanks for rating {rating} star(s)!"
 
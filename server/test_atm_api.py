@@ -0,0 +1,58 @@
+import os
+import unittest
+from atm_core import ATM
+
+try:
+    import atm_api
+except ImportError:  # flask / flask_cors not installed
+    atm_api = None
+
+
+TEST_FILE = "test_api_users.json"
+
+@unittest.skipIf(atm_api is None, "flask is not installed")
+class TestUserSearchAPI(unittest.TestCase):
+    def setUp(self):
+        if os.path.exists(TEST_FILE):
+            os.remove(TEST_FILE)
+        # swap in an isolated ATM so the real users.json is never touched
+        self.original_atm = atm_api.atm
+        atm_api.atm = ATM(data_file=TEST_FILE)
+        for i in range(atm_api.MAX_SEARCH_LIMIT + 5):
+            atm_api.atm.create_account(f"user{i:03d}", "pw", "1234")
+        atm_api.atm.create_account("Shashi Bala", "pw", "1234")
+        self.client = atm_api.app.test_client()
+
+    def tearDown(self):
+        atm_api.atm = self.original_atm
+        if os.path.exists(TEST_FILE):
+            os.remove(TEST_FILE)
+
+    def test_requires_login(self):
+        res = self.client.get("/users/search?prefix=sh")
+        self.assertEqual(res.status_code, 401)
+
+    def test_search(self):
+        atm_api.atm.login("user000", "pw")
+        res = self.client.get("/users/search?prefix=SHASHI")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()["users"], ["Shashi Bala"])
+
+    def test_invalid_limit(self):
+        atm_api.atm.login("user000", "pw")
+        res = self.client.get("/users/search?prefix=user&limit=abc")
+        self.assertEqual(res.status_code, 400)
+        res = self.client.get("/users/search?prefix=user&limit=-1")
+        self.assertEqual(res.status_code, 400)
+
+    def test_limit_clamped(self):
+        atm_api.atm.login("user000", "pw")
+        res = self.client.get("/users/search?prefix=user&limit=1000")
+        self.assertEqual(len(res.get_json()["users"]), atm_api.MAX_SEARCH_LIMIT)
+        res = self.client.get("/users/search?prefix=user&limit=0")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.get_json()["users"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,9 @@
 import os, sys
 import json
+import shutil
 import unittest
+from unittest import mock
+import atm_core
 from atm_core import ATM, sha256
 print("ATM module imported from:", ATM.__module__)
 print("ATM class defined in:", os.path.abspath(sys.modules[ATM.__module__].__file__))
@@ -8,6 +11,7 @@ print("ATM.change_pin function:", ATM.change_pin)
 
 
 TEST_FILE = "test_users.json"
+TEST_DIR = "test_accounts"
 
 class TestATMCore(unittest.TestCase):
     def setUp(self):
@@ -75,6 +79,67 @@ class TestATMCore(unittest.TestCase):
         self.assertAlmostEqual(self.atm.get_balance("john"), 400)
         self.assertAlmostEqual(self.atm.get_balance("mary"), 100)
 
+    def test_transfer_normalized_recipient(self):
+        self.atm.create_account("john", "pw", "1234")
+        self.atm.create_account("Shashi Bala", "pw", "1234")
+        self.atm.login("john", "pw")
+        self.atm.deposit(500)
+        ok, msg = self.atm.transfer("  shashi   BALA ", 100, "1234")
+        self.assertTrue(ok)
+        self.assertAlmostEqual(self.atm.get_balance("Shashi Bala"), 100)
+        ok, msg = self.atm.transfer("JOHN", 100, "1234")
+        self.assertFalse(ok)
+        self.assertIn("yourself", msg)
+        ok, msg = self.atm.transfer("nobody", 100, "1234")
+        self.assertFalse(ok)
+        self.assertIn("not found", msg)
+
+    def test_normalized_duplicate_account(self):
+        self.atm.create_account("john", "pw", "1234")
+        self.atm.create_account("jo hn", "pw", "1234")
+        ok, msg = self.atm.create_account("John", "pw", "1234")
+        self.assertFalse(ok)
+        self.assertIn("exists", msg)
+        ok, msg = self.atm.create_account("jo  hn", "pw", "1234")
+        self.assertFalse(ok)
+        self.assertIn("exists", msg)
+
+    def test_transfer_ambiguous_recipient(self):
+        # Legacy data may already hold names that differ only by case/spacing
+        self.atm.create_account("payer", "pw", "1234")
+        self.atm.users = dict(self.atm.users, **{
+            "john": {"balance": 0.0, "transactions": []},
+            "John": {"balance": 0.0, "transactions": []},
+            "jo hn": {"balance": 0.0, "transactions": []},
+            "jo  hn": {"balance": 0.0, "transactions": []},
+        })
+        self.atm.login("payer", "pw")
+        self.atm.deposit(500)
+        for name in ("JOHN", "Jo Hn"):
+            ok, msg = self.atm.transfer(name, 10, "1234")
+            self.assertFalse(ok)
+            self.assertIn("ambiguous", msg)
+        ok, msg = self.atm.transfer("John", 10, "1234")
+        self.assertTrue(ok)
+        self.assertAlmostEqual(self.atm.get_balance("John"), 10)
+        self.assertAlmostEqual(self.atm.get_balance("john"), 0)
+        self.assertEqual(self.atm.resolve_username("JOHN"), ["john", "John"])
+        self.assertEqual(self.atm.resolve_username("John"), ["John"])
+
+    def test_search_users(self):
+        for name in ["Shashi Bala", "shiva", "Shizuka Minamoto", "Apple"]:
+            self.atm.create_account(name, "pw", "1234")
+        self.assertEqual(self.atm.search_users("sh"), ["Shashi Bala", "shiva", "Shizuka Minamoto"])
+        self.assertEqual(self.atm.search_users("SHI", limit=1), ["shiva"])
+        self.assertEqual(self.atm.search_users("shashi  b"), ["Shashi Bala"])
+        self.assertEqual(self.atm.search_users("z"), [])
+        self.assertEqual(self.atm.search_users(""), [])
+
+    def test_index_rebuilt_on_users_replace(self):
+        self.atm.users = {"Nobita Nobi": {"balance": 0.0, "transactions": []}}
+        self.assertEqual(self.atm.search_users("nob"), ["Nobita Nobi"])
+        self.assertEqual(self.atm.resolve_username("nobita nobi"), ["Nobita Nobi"])
+
     def test_change_pin(self):
         self.atm.create_account("ella", "p", "0000")
         self.atm.login("ella", "p")
@@ -107,5 +172,152 @@ class TestATMCore(unittest.TestCase):
         self.assertIn("persist", new_atm.users)
         self.assertAlmostEqual(new_atm.get_balance("persist"), balance_before)
 
+
+class TestATMAccountFiles(unittest.TestCase):
+    def setUp(self):
+        for path in (TEST_FILE, TEST_DIR):
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        self.atm = ATM(data_file=TEST_FILE, accounts_dir=TEST_DIR)
+
+    def tearDown(self):
+        if os.path.exists(TEST_FILE):
+            os.remove(TEST_FILE)
+        if os.path.isdir(TEST_DIR):
+            shutil.rmtree(TEST_DIR)
+
+    def test_one_file_per_account(self):
+        self.atm.create_account("john", "pw", "1234")
+        self.atm.create_account("Shashi Bala", "pw", "1234")
+        self.assertEqual(len(os.listdir(TEST_DIR)), 2)
+        self.assertFalse(os.path.exists(TEST_FILE))
+
+    def test_only_dirty_accounts_written(self):
+        self.atm.create_account("john", "pw", "1234")
+        self.atm.create_account("mary", "pw", "1234")
+        mary_path = self.atm._account_path("mary")
+        os.utime(mary_path, ns=(0, 0))
+
+        self.atm.login("john", "pw")
+        self.atm.deposit(500)
+        self.assertEqual(os.stat(mary_path).st_mtime_ns, 0)
+        self.assertFalse(self.atm._dirty)
+
+    def test_reload_from_account_files(self):
+        self.atm.create_account("john", "pw", "1234")
+        self.atm.create_account("mary", "pw", "1234")
+        self.atm.login("john", "pw")
+        self.atm.deposit(500)
+        self.atm.transfer("mary", 200, "1234")
+
+        new_atm = ATM(data_file=TEST_FILE, accounts_dir=TEST_DIR)
+        self.assertAlmostEqual(new_atm.get_balance("john"), 300)
+        self.assertAlmostEqual(new_atm.get_balance("mary"), 200)
+        self.assertEqual(new_atm.search_users("ma"), ["mary"])
+
+    def test_transfer_saves_both_accounts_together(self):
+        self.atm.create_account("john", "pw", "1234")
+        self.atm.create_account("mary", "pw", "1234")
+        self.atm.login("john", "pw")
+        self.atm.deposit(500)
+
+        snapshots = []
+        real_save = self.atm._save
+
+        def recording_save():
+            real_save()
+            snapshots.append(ATM(data_file=TEST_FILE, accounts_dir=TEST_DIR))
+
+        self.atm._save = recording_save
+        self.atm.transfer("mary", 200, "1234")
+        self.assertEqual(len(snapshots), 1)
+        self.assertAlmostEqual(snapshots[0].get_balance("john"), 300)
+        self.assertAlmostEqual(snapshots[0].get_balance("mary"), 200)
+
+    def test_failed_transfer_save_persists_nothing(self):
+        self.atm.create_account("john", "pw", "1234")
+        self.atm.create_account("mary", "pw", "1234")
+        self.atm.login("john", "pw")
+        self.atm.deposit(500)
+
+        real_write = atm_core._write_temp_json
+        calls = []
+
+        def failing_write(path, data):
+            calls.append(path)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            return real_write(path, data)
+
+        with mock.patch("atm_core._write_temp_json", failing_write):
+            ok, msg = self.atm.transfer("mary", 200, "1234")
+        self.assertFalse(ok)
+        self.assertIn("failed", msg)
+        self.assertAlmostEqual(self.atm.get_balance("john"), 500)
+        self.assertAlmostEqual(self.atm.get_balance("mary"), 0)
+        self.assertEqual(len(self.atm.get_transactions("mary")), 0)
+        self.assertFalse([n for n in os.listdir(TEST_DIR) if n.endswith(".tmp")])
+
+        new_atm = ATM(data_file=TEST_FILE, accounts_dir=TEST_DIR)
+        self.assertAlmostEqual(new_atm.get_balance("john"), 500)
+        self.assertAlmostEqual(new_atm.get_balance("mary"), 0)
+
+    def test_failed_migration_is_retried(self):
+        legacy = ATM(data_file=TEST_FILE)
+        for name in ("a", "b", "c"):
+            legacy.create_account(name, "pw", "1111")
+
+        real_write = atm_core._atomic_write_json
+        calls = []
+
+        def failing_write(path, data):
+            calls.append(path)
+            if len(calls) == 2:
+                raise OSError("disk full")
+            real_write(path, data)
+
+        with mock.patch("atm_core._atomic_write_json", failing_write):
+            with self.assertRaises(RuntimeError):
+                ATM(data_file=TEST_FILE, accounts_dir=TEST_DIR)
+        self.assertEqual(os.listdir(TEST_DIR), [])
+
+        new_atm = ATM(data_file=TEST_FILE, accounts_dir=TEST_DIR)
+        self.assertEqual(sorted(new_atm.users), ["a", "b", "c"])
+
+    def test_migrates_legacy_file(self):
+        legacy = ATM(data_file=TEST_FILE)
+        legacy.create_account("persist", "pw", "1111")
+
+        new_atm = ATM(data_file=TEST_FILE, accounts_dir=TEST_DIR)
+        self.assertIn("persist", new_atm.users)
+        self.assertEqual(len(os.listdir(TEST_DIR)), 1)
+
+    def test_refuses_non_empty_accounts_dir(self):
+        legacy = ATM(data_file=TEST_FILE)
+        legacy.create_account("persist", "pw", "1111")
+        with open(os.path.join(TEST_DIR, "important.txt"), "w") as f:
+            f.write("keep me")
+        os.mkdir(os.path.join(TEST_DIR, "sub"))
+
+        with self.assertRaises(RuntimeError):
+            ATM(data_file=TEST_FILE, accounts_dir=TEST_DIR)
+        self.assertEqual(sorted(os.listdir(TEST_DIR)), ["important.txt", "sub"])
+
+    def test_rejects_data_file_folder(self):
+        data_file = os.path.join(TEST_DIR, "users.json")
+        with self.assertRaises(RuntimeError):
+            ATM(data_file=data_file, accounts_dir=TEST_DIR)
+
+    def test_ignores_other_json_files(self):
+        self.atm.create_account("john", "pw", "1234")
+        with open(os.path.join(TEST_DIR, "notes.json"), "w") as f:
+            json.dump({"not": "an account"}, f)
+
+        new_atm = ATM(data_file=TEST_FILE, accounts_dir=TEST_DIR)
+        self.assertEqual(list(new_atm.users), ["john"])
+
+
 if __name__ == "__main__":
     unittest.main()